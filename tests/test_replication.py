@@ -8,21 +8,39 @@ setups to ensure PostgreSQL logical replication works correctly.
 """
 
 import os
+import math
 import sys
 import time
-import subprocess
+import atexit
+import select
+import socket
+import threading
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 import pytest
 from typing import Dict, List, Optional, Tuple
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict, fields
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-@dataclass
+def _backoff(timeout: float, initial: float, factor: float = 1.5, maximum: float = 2.0):
+    """Yield the remaining time once per attempt until timeout, backing off exponentially"""
+    deadline = time.time() + timeout
+    delay = initial
+    while True:
+        yield max(deadline - time.time(), 0)
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return
+        time.sleep(min(delay, remaining))
+        delay = min(delay * factor, maximum)
+
+@dataclass(frozen=True, slots=True)
 class DatabaseConfig:
     """Database connection configuration"""
     host: str
@@ -34,17 +52,199 @@ class DatabaseConfig:
     def connection_string(self) -> str:
         return f"postgresql://{self.username}:{self.password}@{self.host}:{self.port}/{self.database}"
 
+@dataclass(slots=True)
+class ConnectivityResult:
+    """Result of the database connectivity test"""
+    source_ready: bool = False
+    target_ready: bool = False
+    both_ready: bool = False
+
+@dataclass(slots=True)
+class SetupResult:
+    """Result of the replication setup test"""
+    publication_exists: bool = False
+    replication_slot_exists: bool = False
+    subscription_exists: bool = False
+    subscription_enabled: bool = False
+    
+    @property
+    def ok(self) -> bool:
+        return (self.publication_exists and self.replication_slot_exists and
+                self.subscription_exists and self.subscription_enabled)
+
+@dataclass(slots=True)
+class DataReplicationResult:
+    """Result of the data replication test"""
+    test_data_inserted: bool = False
+    user_id_range: Optional[Tuple[int, int]] = None
+    order_id_range: Optional[Tuple[int, int]] = None
+    replication_wait_seconds: Optional[float] = None
+    user_replicated: bool = False
+    order_replicated: bool = False
+    throughput_rows_per_sec: Optional[float] = None
+
+@dataclass(slots=True)
+class LagResult:
+    """Result of the replication lag test"""
+    replication_active: bool = False
+    lag_bytes: Optional[int] = None
+    lag_acceptable: bool = False
+
+@dataclass(slots=True)
+class ComprehensiveResult:
+    """Results of all replication tests"""
+    connectivity: ConnectivityResult
+    setup: Optional[SetupResult] = None
+    data_replication: Optional[DataReplicationResult] = None
+    performance: Optional[LagResult] = None
+    overall_success: bool = False
+
+# Queries that are repeated while polling, prepared server-side once per connection
+_PREPARED_STATEMENTS: Dict[str, str] = {
+    'wait_lsn': """
+        SELECT COALESCE(bool_or(latest_end_lsn >= $1::pg_lsn), false)
+        FROM pg_stat_subscription
+        WHERE subname = 'my_subscription' AND relid IS NULL
+    """,
+    'check_rows': """
+        SELECT (SELECT COUNT(*) FROM users WHERE id = ANY($1::int[])),
+               (SELECT COUNT(*) FROM orders WHERE id = ANY($2::int[]))
+    """,
+}
+
+class _PooledConnection(psycopg2.extensions.connection):
+    """Connection with per-session setup done once, when it is first opened by a pool"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.autocommit = True
+        self.prepared = set()
+    
+    def is_stale(self) -> bool:
+        """Check, without a round trip, whether the server side of an idle connection has gone away"""
+        if self.closed:
+            return True
+        # An idle connection has nothing to read unless the server sent its termination
+        # notice or the socket hit EOF (restart, idle-session kill, dropped port-forward)
+        readable, _, _ = select.select([self], [], [], 0)
+        return bool(readable)
+    
+    def execute_prepared(self, cur, name: str, params: Tuple):
+        """Execute a named prepared statement, preparing it on first use"""
+        if name not in self.prepared:
+            cur.execute(f"PREPARE {name} AS {_PREPARED_STATEMENTS[name]};")
+            self.prepared.add(name)
+        placeholders = ', '.join(['%s'] * len(params))
+        cur.execute(f"EXECUTE {name}({placeholders});", params)
+
+@dataclass(slots=True)
+class _InsertedBatch:
+    """Test rows inserted on the source, pending verification on the target"""
+    user_ids: List[int]
+    order_ids: List[int]
+    source_lsn: str
+    inserted_at: float
+    confirmed_at: Optional[float] = None
+    
+    @property
+    def user_id_range(self) -> Tuple[int, int]:
+        return min(self.user_ids), max(self.user_ids)
+    
+    @property
+    def order_id_range(self) -> Tuple[int, int]:
+        return min(self.order_ids), max(self.order_ids)
+
+# Connection pools shared by all testers, keyed by database configuration
+_POOLS: Dict[DatabaseConfig, ThreadedConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+# Upper bound in seconds on opening a connection, as the pg_isready subprocess timeout used to be
+_CONNECT_TIMEOUT = 5
+
+def _get_pool(config: DatabaseConfig) -> ThreadedConnectionPool:
+    """Return the shared pool for a database, creating it on first use"""
+    with _POOLS_LOCK:
+        pool = _POOLS.get(config)
+    if pool is not None:
+        return pool
+    
+    # The pool opens its first connection on creation, so build it outside the lock
+    # to keep a stalled host from blocking connections to every other host
+    new_pool = ThreadedConnectionPool(
+        1, 4,
+        connection_factory=_PooledConnection,
+        host=config.host,
+        port=config.port,
+        database=config.database,
+        user=config.username,
+        password=config.password,
+        connect_timeout=_CONNECT_TIMEOUT
+    )
+    with _POOLS_LOCK:
+        pool = _POOLS.setdefault(config, new_pool)
+    if pool is not new_pool:
+        new_pool.closeall()
+    return pool
+
+def _close_pools():
+    """Close every pooled connection on interpreter exit"""
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.closeall()
+        _POOLS.clear()
+
+atexit.register(_close_pools)
+
+def _parse_lsn(lsn: str) -> int:
+    """Convert a textual pg_lsn ('16/B374D848') to its 64-bit integer position"""
+    high, low = lsn.split('/')
+    return (int(high, 16) << 32) | int(low, 16)
+
 class ReplicationTester:
     """Main class for testing PostgreSQL logical replication"""
     
     def __init__(self, source_config: DatabaseConfig, target_config: DatabaseConfig):
         self.source_config = source_config
         self.target_config = target_config
-        self.test_data_inserted = False
     
     @contextmanager
     def get_connection(self, config: DatabaseConfig):
-        """Context manager for database connections"""
+        """Context manager for pooled database connections"""
+        pool = None
+        conn = None
+        broken = False
+        try:
+            pool = _get_pool(config)
+            conn = pool.getconn()
+            # Discard idle connections the server closed since they were returned to the pool
+            for _ in range(pool.maxconn):
+                if not conn.is_stale():
+                    break
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            # Callers report their own failures; this is routinely hit while waiting for startup
+            broken = True
+            logger.debug(f"Database connection error: {e}")
+            raise
+        finally:
+            if conn:
+                # Drop connections that failed at the transport level instead of reusing them
+                pool.putconn(conn, close=broken or bool(conn.closed))
+    
+    def _probe_database(self, config: DatabaseConfig, timeout: float = _CONNECT_TIMEOUT) -> bool:
+        """Check that the database accepts TCP connections and authenticates"""
+        try:
+            # Cheap liveness check before paying for a full connection handshake
+            with socket.create_connection((config.host, config.port), timeout=min(2, max(timeout, 0.1))):
+                pass
+        except OSError:
+            return False
+        
+        # Confirm authentication on a dedicated connection: pooled connections reuse the
+        # pool's fixed connect_timeout, while the probe must stay within the time left.
+        # libpq takes whole seconds and treats anything below 2 as 2.
         conn = None
         try:
             conn = psycopg2.connect(
@@ -52,47 +252,49 @@ class ReplicationTester:
                 port=config.port,
                 database=config.database,
                 user=config.username,
-                password=config.password
+                password=config.password,
+                connect_timeout=max(2, min(_CONNECT_TIMEOUT, math.ceil(timeout)))
             )
-            conn.autocommit = True
-            yield conn
-        except Exception as e:
-            logger.error(f"Database connection error: {e}")
-            raise
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+                return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
         finally:
             if conn:
                 conn.close()
     
-    def wait_for_database(self, config: DatabaseConfig, timeout: int = 60) -> bool:
+    def _pg_isready(self, config: DatabaseConfig, timeout: float = _CONNECT_TIMEOUT) -> bool:
+        """Check database readiness with the pg_isready client binary"""
+        import subprocess
+        
+        try:
+            result = subprocess.run([
+                'pg_isready', 
+                '-h', config.host,
+                '-p', str(config.port),
+                '-U', config.username,
+                '-d', config.database
+            ], capture_output=True, text=True, timeout=max(1, min(_CONNECT_TIMEOUT, timeout)))
+            return result.returncode == 0
+        except (subprocess.TimeoutExpired, FileNotFoundError):
+            # Fallback to the TCP probe if pg_isready is not available
+            return self._probe_database(config, timeout)
+    
+    def wait_for_database(self, config: DatabaseConfig, timeout: int = 60,
+                          use_pg_isready: bool = False) -> bool:
         """Wait for database to be ready"""
         logger.info(f"Waiting for database at {config.host}:{config.port} to be ready...")
         
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                # Use pg_isready for health check
-                result = subprocess.run([
-                    'pg_isready', 
-                    '-h', config.host,
-                    '-p', str(config.port),
-                    '-U', config.username,
-                    '-d', config.database
-                ], capture_output=True, text=True, timeout=5)
-                
-                if result.returncode == 0:
-                    logger.info(f"Database at {config.host}:{config.port} is ready")
-                    return True
-                    
-            except (subprocess.TimeoutExpired, FileNotFoundError):
-                # Fallback to psycopg2 connection test if pg_isready is not available
-                try:
-                    with self.get_connection(config):
-                        logger.info(f"Database at {config.host}:{config.port} is ready")
-                        return True
-                except:
-                    pass
-            
-            time.sleep(2)
+        # A real TCP connection is used by default: pg_isready can report ready while the
+        # container is still running its temporary initdb server on the unix socket
+        check = self._pg_isready if use_pg_isready else self._probe_database
+        
+        # Poll quickly at first so fast-starting databases are not held back by the retry interval
+        for remaining in _backoff(timeout, initial=0.1):
+            if check(config, remaining):
+                logger.info(f"Database at {config.host}:{config.port} is ready")
+                return True
         
         logger.error(f"Database at {config.host}:{config.port} not ready after {timeout}s")
         return False
@@ -101,208 +303,285 @@ class ReplicationTester:
         """Test connectivity to both source and target databases"""
         logger.info("Testing database connectivity...")
         
-        source_ready = self.wait_for_database(self.source_config)
-        target_ready = self.wait_for_database(self.target_config)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            source_future = executor.submit(self.wait_for_database, self.source_config)
+            target_future = executor.submit(self.wait_for_database, self.target_config)
+            source_ready = source_future.result()
+            target_ready = target_future.result()
         
         return source_ready, target_ready
     
-    def test_replication_setup(self) -> Dict[str, bool]:
+    def test_replication_setup(self) -> SetupResult:
         """Test that replication is properly set up"""
         logger.info("Testing replication setup...")
-        results = {}
+        results = SetupResult()
         
-        # Test publication exists on source
-        try:
-            with self.get_connection(self.source_config) as conn:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT COUNT(*) FROM pg_publication WHERE pubname = 'my_publication';")
-                    pub_count = cur.fetchone()[0]
-                    results['publication_exists'] = pub_count > 0
-                    logger.info(f"Publication exists: {results['publication_exists']}")
-        except Exception as e:
-            logger.error(f"Error checking publication: {e}")
-            results['publication_exists'] = False
-        
-        # Test subscription exists on target
-        try:
-            with self.get_connection(self.target_config) as conn:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT COUNT(*) FROM pg_subscription WHERE subname = 'my_subscription';")
-                    sub_count = cur.fetchone()[0]
-                    results['subscription_exists'] = sub_count > 0
-                    logger.info(f"Subscription exists: {results['subscription_exists']}")
-        except Exception as e:
-            logger.error(f"Error checking subscription: {e}")
-            results['subscription_exists'] = False
-        
-        # Test replication slot exists on source
-        try:
-            with self.get_connection(self.source_config) as conn:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT COUNT(*) FROM pg_replication_slots WHERE slot_name = 'my_subscription';")
-                    slot_count = cur.fetchone()[0]
-                    results['replication_slot_exists'] = slot_count > 0
-                    logger.info(f"Replication slot exists: {results['replication_slot_exists']}")
-        except Exception as e:
-            logger.error(f"Error checking replication slot: {e}")
-            results['replication_slot_exists'] = False
-        
-        # Test subscription is enabled and active
-        try:
-            with self.get_connection(self.target_config) as conn:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT subenabled FROM pg_subscription WHERE subname = 'my_subscription';")
-                    result = cur.fetchone()
-                    results['subscription_enabled'] = result[0] if result else False
-                    logger.info(f"Subscription enabled: {results['subscription_enabled']}")
-        except Exception as e:
-            logger.error(f"Error checking subscription status: {e}")
-            results['subscription_enabled'] = False
+        # Test publication and replication slot exist on source
+        def _check_source():
+            try:
+                with self.get_connection(self.source_config) as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("""
+                            SELECT
+                                (SELECT COUNT(*) FROM pg_publication WHERE pubname = 'my_publication'),
+                                (SELECT COUNT(*) FROM pg_replication_slots WHERE slot_name = 'my_subscription');
+                        """)
+                        pub_count, slot_count = cur.fetchone()
+                        results.publication_exists = pub_count > 0
+                        results.replication_slot_exists = slot_count > 0
+            except psycopg2.Error as e:
+                logger.error(f"Error checking publication and replication slot: {e}")
+        
+        # Test subscription exists on target and is enabled
+        def _check_target():
+            try:
+                with self.get_connection(self.target_config) as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("""
+                            SELECT COUNT(*) > 0, COALESCE(bool_or(subenabled), false)
+                            FROM pg_subscription
+                            WHERE subname = 'my_subscription';
+                        """)
+                        results.subscription_exists, results.subscription_enabled = cur.fetchone()
+            except psycopg2.Error as e:
+                logger.error(f"Error checking subscription: {e}")
+        
+        # One round trip per side, with both sides queried concurrently
+        checks = [_check_source, _check_target]
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            futures = [executor.submit(check) for check in checks]
+            for future in as_completed(futures):
+                future.result()
+        
+        logger.info(f"Publication exists: {results.publication_exists}")
+        logger.info(f"Subscription exists: {results.subscription_exists}")
+        logger.info(f"Replication slot exists: {results.replication_slot_exists}")
+        logger.info(f"Subscription enabled: {results.subscription_enabled}")
         
         return results
     
-    def test_data_replication(self, timeout: int = 30) -> Dict[str, any]:
-        """Test actual data replication"""
-        logger.info("Testing data replication...")
-        results = {}
+    def _insert_test_rows(self, batch_size: int = 1000) -> Optional[_InsertedBatch]:
+        """Insert a batch of test users and orders on the source"""
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
         
-        # Insert test data on source
-        test_timestamp = int(time.time())
-        test_email = f"test_{test_timestamp}@example.com"
-        test_name = f"Test User {test_timestamp}"
+        logger.info(f"Inserting {batch_size} test rows...")
         
+        test_timestamp = time.time_ns()
+        names = [f"Test User {test_timestamp}-{i}" for i in range(batch_size)]
+        emails = [f"test_{test_timestamp}_{i}@example.com" for i in range(batch_size)]
+        
+        inserted_at = time.time()
         try:
             with self.get_connection(self.source_config) as conn:
                 with conn.cursor() as cur:
-                    # Insert test user
-                    cur.execute(
-                        "INSERT INTO users (name, email) VALUES (%s, %s) RETURNING id;",
-                        (test_name, test_email)
-                    )
-                    test_user_id = cur.fetchone()[0]
-                    
-                    # Insert test order
-                    cur.execute(
-                        "INSERT INTO orders (user_id, product_name, amount) VALUES (%s, %s, %s) RETURNING id;",
-                        (test_user_id, f"Test Product {test_timestamp}", 99.99)
-                    )
-                    test_order_id = cur.fetchone()[0]
+                    # Insert the users and one order per user in a single statement
+                    cur.execute("""
+                        WITH u AS (
+                            INSERT INTO users (name, email)
+                            SELECT * FROM unnest(%s::text[], %s::text[])
+                            RETURNING id
+                        ), o AS (
+                            INSERT INTO orders (user_id, product_name, amount)
+                            SELECT id, %s, %s FROM u
+                            RETURNING id
+                        )
+                        SELECT ARRAY(SELECT id FROM u), ARRAY(SELECT id FROM o);
+                    """, (names, emails, f"Test Product {test_timestamp}", 99.99))
+                    user_ids, order_ids = cur.fetchone()
                     
-                    results['test_data_inserted'] = True
-                    results['test_user_id'] = test_user_id
-                    results['test_order_id'] = test_order_id
-                    logger.info(f"Test data inserted: user_id={test_user_id}, order_id={test_order_id}")
+                    # Capture the source WAL position once the insert has committed; a position
+                    # read inside the transaction precedes its commit record and is confirmed by
+                    # the subscriber before the rows are applied
+                    cur.execute("SELECT pg_current_wal_lsn();")
+                    source_lsn = cur.fetchone()[0]
                     
-        except Exception as e:
+        except psycopg2.Error as e:
             logger.error(f"Error inserting test data: {e}")
-            results['test_data_inserted'] = False
-            return results
+            return None
+        
+        batch = _InsertedBatch(user_ids, order_ids, source_lsn, inserted_at)
+        logger.info(f"Test data inserted: user_ids={batch.user_id_range}, "
+                    f"order_ids={batch.order_id_range}, lsn={source_lsn}")
+        return batch
+    
+    def _wait_for_test_rows(self, batch: _InsertedBatch, timeout: int = 30) -> DataReplicationResult:
+        """Wait for the subscription to confirm an inserted batch"""
+        results = DataReplicationResult(
+            test_data_inserted=True,
+            user_id_range=batch.user_id_range,
+            order_id_range=batch.order_id_range
+        )
         
-        # Wait for replication
-        logger.info(f"Waiting {timeout}s for replication...")
-        time.sleep(timeout)
+        # Wait for the subscription to confirm the source LSN instead of sleeping a fixed timeout.
+        # pg_last_wal_replay_lsn() is only meaningful on physical standbys, so the logical
+        # subscriber's progress is read from pg_stat_subscription.
+        logger.info(f"Waiting up to {timeout}s for replication to reach {batch.source_lsn}...")
+        wait_start = time.time()
+        for _ in _backoff(timeout, initial=0.05):
+            try:
+                with self.get_connection(self.target_config) as conn:
+                    with conn.cursor() as cur:
+                        conn.execute_prepared(cur, 'wait_lsn', (batch.source_lsn,))
+                        if cur.fetchone()[0]:
+                            break
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                logger.debug(f"Error polling subscription progress: {e}")
+        else:
+            logger.warning(f"Subscription did not confirm {batch.source_lsn} within {timeout}s")
+        
+        batch.confirmed_at = time.time()
+        results.replication_wait_seconds = batch.confirmed_at - wait_start
+        logger.info(f"Replication wait: {results.replication_wait_seconds:.2f}s")
         
+        return results
+    
+    def _check_test_rows(self, batch: _InsertedBatch, results: DataReplicationResult) -> DataReplicationResult:
+        """Verify that a confirmed batch is present on the target"""
         # Verify data on target
         try:
             with self.get_connection(self.target_config) as conn:
                 with conn.cursor() as cur:
-                    # Check user replication
-                    cur.execute("SELECT COUNT(*) FROM users WHERE email = %s;", (test_email,))
-                    user_count = cur.fetchone()[0]
-                    results['user_replicated'] = user_count > 0
-                    
-                    # Check order replication
-                    cur.execute("SELECT COUNT(*) FROM orders WHERE user_id = %s;", (test_user_id,))
-                    order_count = cur.fetchone()[0]
-                    results['order_replicated'] = order_count > 0
+                    # Check user and order replication in a single round trip
+                    conn.execute_prepared(cur, 'check_rows', (batch.user_ids, batch.order_ids))
+                    user_count, order_count = cur.fetchone()
+                    results.user_replicated = user_count == len(batch.user_ids)
+                    results.order_replicated = order_count == len(batch.order_ids)
                     
-                    logger.info(f"User replicated: {results['user_replicated']}")
-                    logger.info(f"Order replicated: {results['order_replicated']}")
+                    logger.info(f"User replicated: {results.user_replicated} ({user_count}/{len(batch.user_ids)})")
+                    logger.info(f"Order replicated: {results.order_replicated} ({order_count}/{len(batch.order_ids)})")
                     
-        except Exception as e:
+        except psycopg2.Error as e:
             logger.error(f"Error verifying replicated data: {e}")
-            results['user_replicated'] = False
-            results['order_replicated'] = False
+            results.user_replicated = False
+            results.order_replicated = False
+        
+        # End-to-end throughput from the start of the insert until the target confirmed it
+        if results.user_replicated and results.order_replicated:
+            elapsed = max(batch.confirmed_at - batch.inserted_at, 1e-6)
+            results.throughput_rows_per_sec = (len(batch.user_ids) + len(batch.order_ids)) / elapsed
+            logger.info(f"Replication throughput: {results.throughput_rows_per_sec:.0f} rows/s")
         
         return results
     
-    def test_replication_lag(self) -> Dict[str, any]:
+    def test_data_replication(self, timeout: int = 30, batch_size: int = 1000) -> DataReplicationResult:
+        """Test actual data replication and measure its throughput"""
+        logger.info(f"Testing data replication with {batch_size} rows...")
+        
+        batch = self._insert_test_rows(batch_size)
+        if batch is None:
+            return DataReplicationResult()
+        
+        results = self._wait_for_test_rows(batch, timeout)
+        return self._check_test_rows(batch, results)
+    
+    def test_replication_lag(self) -> LagResult:
         """Test replication lag and performance"""
         logger.info("Testing replication lag...")
-        results = {}
+        results = LagResult()
         
-        try:
-            with self.get_connection(self.source_config) as conn:
-                with conn.cursor() as cur:
-                    # Get replication statistics
-                    cur.execute("""
-                        SELECT application_name, state, sent_lsn, write_lsn, flush_lsn, replay_lsn,
-                               pg_wal_lsn_diff(sent_lsn, replay_lsn) as lag_bytes
-                        FROM pg_stat_replication 
-                        WHERE application_name = 'my_subscription';
-                    """)
-                    repl_stats = cur.fetchone()
-                    
-                    if repl_stats:
-                        results['replication_active'] = repl_stats[1] == 'streaming'
-                        results['lag_bytes'] = repl_stats[6] if repl_stats[6] else 0
-                        results['lag_acceptable'] = results['lag_bytes'] < 1024  # Less than 1KB lag
-                        logger.info(f"Replication lag: {results['lag_bytes']} bytes")
-                    else:
-                        results['replication_active'] = False
-                        results['lag_bytes'] = None
-                        results['lag_acceptable'] = False
-                        
-        except Exception as e:
-            logger.error(f"Error checking replication lag: {e}")
-            results['replication_active'] = False
-            results['lag_bytes'] = None
-            results['lag_acceptable'] = False
+        # Current WAL position on source, plus the walsender state if it is connected
+        def _source_stats() -> Tuple[Optional[str], Optional[bool]]:
+            try:
+                with self.get_connection(self.source_config) as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("""
+                            SELECT pg_current_wal_lsn(),
+                                   (SELECT state = 'streaming'
+                                    FROM pg_stat_replication
+                                    WHERE application_name = 'my_subscription'
+                                    LIMIT 1);
+                        """)
+                        return cur.fetchone()
+            except psycopg2.Error as e:
+                logger.error(f"Error checking source replication statistics: {e}")
+                return None, None
+        
+        # Apply worker progress on target; the row exists for as long as the subscription does
+        def _target_stats() -> Tuple[Optional[bool], Optional[str]]:
+            try:
+                with self.get_connection(self.target_config) as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("""
+                            SELECT pid IS NOT NULL, latest_end_lsn
+                            FROM pg_stat_subscription
+                            WHERE subname = 'my_subscription' AND relid IS NULL
+                            LIMIT 1;
+                        """)
+                        return cur.fetchone() or (None, None)
+            except psycopg2.Error as e:
+                logger.error(f"Error checking target subscription statistics: {e}")
+                return None, None
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            source_future = executor.submit(_source_stats)
+            target_future = executor.submit(_target_stats)
+            current_lsn, walsender_streaming = source_future.result()
+            apply_worker_running, confirmed_lsn = target_future.result()
+        
+        # The walsender row disappears while the subscription reconnects, so either side
+        # reporting a live replication process counts as active
+        results.replication_active = bool(walsender_streaming or apply_worker_running)
+        
+        if current_lsn is not None and confirmed_lsn is not None:
+            results.lag_bytes = max(_parse_lsn(current_lsn) - _parse_lsn(confirmed_lsn), 0)
+            results.lag_acceptable = results.lag_bytes < 1024  # Less than 1KB lag
+            logger.info(f"Replication lag: {results.lag_bytes} bytes")
         
         return results
     
-    def run_comprehensive_test(self) -> Dict[str, any]:
+    def run_comprehensive_test(self, timeout: int = 30, batch_size: int = 1000) -> ComprehensiveResult:
         """Run all tests and return comprehensive results"""
         logger.info("Starting comprehensive replication test...")
         
-        all_results = {}
-        
         # Test 1: Database connectivity
         source_ready, target_ready = self.test_database_connectivity()
-        all_results['connectivity'] = {
-            'source_ready': source_ready,
-            'target_ready': target_ready,
-            'both_ready': source_ready and target_ready
-        }
+        all_results = ComprehensiveResult(ConnectivityResult(
+            source_ready=source_ready,
+            target_ready=target_ready,
+            both_ready=source_ready and target_ready
+        ))
         
         if not (source_ready and target_ready):
             logger.error("Database connectivity test failed")
             return all_results
         
-        # Test 2: Replication setup
-        all_results['setup'] = self.test_replication_setup()
-        
-        setup_ok = all(all_results['setup'].values())
-        if not setup_ok:
-            logger.error("Replication setup test failed")
-            return all_results
-        
-        # Test 3: Data replication
-        all_results['data_replication'] = self.test_data_replication()
-        
-        # Test 4: Replication lag
-        all_results['performance'] = self.test_replication_lag()
+        # Setup checks are read-only and independent of the test insert, so overlap them.
+        # Once the batch has replicated, verify the data while the lag statistics are collected.
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            # Test 2: Replication setup, with the test data inserted concurrently
+            setup_future = executor.submit(self.test_replication_setup)
+            insert_future = executor.submit(self._insert_test_rows, batch_size)
+            all_results.setup = setup_future.result()
+            batch = insert_future.result()
+            
+            setup_ok = all_results.setup.ok
+            if not setup_ok:
+                logger.error("Replication setup test failed")
+                return all_results
+            
+            # Test 3: Data replication and Test 4: Replication lag
+            if batch:
+                data_results = self._wait_for_test_rows(batch, timeout)
+                check_future = executor.submit(self._check_test_rows, batch, data_results)
+            else:
+                check_future = None
+            lag_future = executor.submit(self.test_replication_lag)
+            all_results.data_replication = (
+                check_future.result() if check_future else DataReplicationResult()
+            )
+            all_results.performance = lag_future.result()
         
         # Overall success
-        all_results['overall_success'] = (
-            all_results['connectivity']['both_ready'] and
+        all_results.overall_success = (
+            all_results.connectivity.both_ready and
             setup_ok and
-            all_results['data_replication'].get('user_replicated', False) and
-            all_results['data_replication'].get('order_replicated', False) and
-            all_results['performance'].get('replication_active', False)
+            all_results.data_replication.user_replicated and
+            all_results.data_replication.order_replicated and
+            all_results.performance.replication_active
         )
         
-        logger.info(f"Comprehensive test completed. Success: {all_results['overall_success']}")
+        logger.info(f"Comprehensive test completed. Success: {all_results.overall_success}")
         return all_results
 
 # Docker Compose Test Configuration
@@ -370,23 +649,23 @@ class TestDockerCompose:
     def test_replication_setup(self, tester):
         """Test replication setup"""
         results = tester.test_replication_setup()
-        assert results['publication_exists'], "Publication should exist on source"
-        assert results['subscription_exists'], "Subscription should exist on target"
-        assert results['replication_slot_exists'], "Replication slot should exist on source"
-        assert results['subscription_enabled'], "Subscription should be enabled"
+        assert results.publication_exists, "Publication should exist on source"
+        assert results.subscription_exists, "Subscription should exist on target"
+        assert results.replication_slot_exists, "Replication slot should exist on source"
+        assert results.subscription_enabled, "Subscription should be enabled"
     
     def test_data_replication(self, tester):
         """Test data replication"""
         results = tester.test_data_replication()
-        assert results['test_data_inserted'], "Test data should be inserted"
-        assert results['user_replicated'], "User data should be replicated"
-        assert results['order_replicated'], "Order data should be replicated"
+        assert results.test_data_inserted, "Test data should be inserted"
+        assert results.user_replicated, "User data should be replicated"
+        assert results.order_replicated, "Order data should be replicated"
     
     def test_replication_performance(self, tester):
         """Test replication performance"""
         results = tester.test_replication_lag()
-        assert results['replication_active'], "Replication should be active"
-        assert results['lag_acceptable'], "Replication lag should be acceptable"
+        assert results.replication_active, "Replication should be active"
+        assert results.lag_acceptable, "Replication lag should be acceptable"
 
 class TestKubernetes:
     """Test cases for Kubernetes setup"""
@@ -405,34 +684,45 @@ class TestKubernetes:
     def test_replication_setup(self, tester):
         """Test replication setup"""
         results = tester.test_replication_setup()
-        assert results['publication_exists'], "Publication should exist on source"
-        assert results['subscription_exists'], "Subscription should exist on target"
-        assert results['replication_slot_exists'], "Replication slot should exist on source"
-        assert results['subscription_enabled'], "Subscription should be enabled"
+        assert results.publication_exists, "Publication should exist on source"
+        assert results.subscription_exists, "Subscription should exist on target"
+        assert results.replication_slot_exists, "Replication slot should exist on source"
+        assert results.subscription_enabled, "Subscription should be enabled"
     
     def test_data_replication(self, tester):
         """Test data replication"""
         results = tester.test_data_replication()
-        assert results['test_data_inserted'], "Test data should be inserted"
-        assert results['user_replicated'], "User data should be replicated"
-        assert results['order_replicated'], "Order data should be replicated"
+        assert results.test_data_inserted, "Test data should be inserted"
+        assert results.user_replicated, "User data should be replicated"
+        assert results.order_replicated, "Order data should be replicated"
     
     def test_replication_performance(self, tester):
         """Test replication performance"""
         results = tester.test_replication_lag()
-        assert results['replication_active'], "Replication should be active"
-        assert results['lag_acceptable'], "Replication lag should be acceptable"
+        assert results.replication_active, "Replication should be active"
+        assert results.lag_acceptable, "Replication lag should be acceptable"
 
 # CLI Interface
 def main():
     """Main CLI interface for running tests"""
     import argparse
     
+    def positive_int(value: str) -> int:
+        try:
+            number = int(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid integer value: '{value}'")
+        if number < 1:
+            raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+        return number
+    
     parser = argparse.ArgumentParser(description='PostgreSQL Replication Test Suite')
     parser.add_argument('--mode', choices=['docker', 'kubernetes'], required=True,
                        help='Test mode: docker or kubernetes')
     parser.add_argument('--timeout', type=int, default=30,
                        help='Timeout for replication tests (default: 30s)')
+    parser.add_argument('--batch-size', type=positive_int, default=1000,
+                       help='Number of test rows to replicate (default: 1000)')
     parser.add_argument('--verbose', action='store_true',
                        help='Enable verbose logging')
     
@@ -449,31 +739,34 @@ def main():
     
     # Run tests
     tester = ReplicationTester(source_config, target_config)
-    results = tester.run_comprehensive_test()
+    results = tester.run_comprehensive_test(args.timeout, args.batch_size)
     
     # Print results
     print("\n" + "="*50)
     print("POSTGRESQL REPLICATION TEST RESULTS")
     print("="*50)
     
-    for category, category_results in results.items():
-        if category == 'overall_success':
+    for category in fields(results):
+        category_results = getattr(results, category.name)
+        if category.name == 'overall_success' or category_results is None:
             continue
             
-        print(f"\n{category.upper()}:")
-        if isinstance(category_results, dict):
-            for test, result in category_results.items():
-                status = "PASS" if result else "FAIL"
-                print(f"  {test}: {status}")
-        else:
-            status = "PASS" if category_results else "FAIL"
-            print(f"  {status}")
-    
-    print(f"\nOVERALL: {'PASS' if results.get('overall_success', False) else 'FAIL'}")
+        print(f"\n{category.name.upper()}:")
+        for test, result in asdict(category_results).items():
+            # Only boolean checks pass or fail; measurements are printed as-is
+            if isinstance(result, bool):
+                value = "PASS" if result else "FAIL"
+            elif isinstance(result, float):
+                value = f"{result:.2f}"
+            else:
+                value = result
+            print(f"  {test}: {value}")
+    
+    print(f"\nOVERALL: {'PASS' if results.overall_success else 'FAIL'}")
     print("="*50)
     
     # Exit with appropriate code
-    sys.exit(0 if results.get('overall_success', False) else 1)
+    sys.exit(0 if results.overall_success else 1)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file